@@ -7,6 +7,11 @@ import argparse
 import glob
 import io
 import os
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from data_extractor import DataExtractor
 from constants import CAVE_NAME, ITEM_TYPES
 
@@ -32,6 +37,116 @@ def GenerateOverworldCSVLine(file_path, data):
    ret.append(data['block_type'])
    return ','.join(ret)
 
+def ReadRom(file_path):
+    """Returns the raw contents of a ROM file."""
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+def GenerateCSVLines(file_path, data_extractor):
+    """Yields the CSV lines describing a parsed ROM."""
+    # Room data for each level
+    for level in range(1, 10):
+        if level in data_extractor.data:
+            for room in data_extractor.data[level]:
+                yield GenerateLevelCSVLine(file_path, level, data_extractor.data[level][room])
+
+    # Overworld screens
+    if data_extractor.data:
+        for screen_num in data_extractor.data[0]:
+            line = GenerateOverworldCSVLine(file_path, data_extractor.data[0][screen_num])
+            if line:
+                yield line
+
+    # Caves
+    if data_extractor.shop_data:
+        for cave_type in [0x10, 0x11, 0x12, 0x13, 0x18]:
+            for i in range (0,3):
+                if data_extractor.shop_data[cave_type][i] != 0x3F:
+                    yield ",".join([file_path, "cave", CAVE_NAME[cave_type],
+                        ITEM_TYPES[data_extractor.shop_data[cave_type][i]]])
+
+    # Shops
+    if data_extractor.shop_data:
+        for cave_type in [0x1D, 0x1E, 0x1F, 0x20, 0x1A, 0x23, 0x21, 0x22]:
+            for i in range (0,3):
+                if data_extractor.shop_data[cave_type][i] != 0x3F:
+                    yield ",".join([file_path, "cave", CAVE_NAME[cave_type],
+                        ITEM_TYPES[data_extractor.shop_data[cave_type][i]],
+                        str(data_extractor.shop_data[cave_type][i+3])])
+
+    # Overworld items as "Level 0"
+    locations = ["Armos", "Coast"]
+    items = data_extractor.GetOverworldItems()
+    for i in range (0, 2):
+        yield ','.join([file_path, '0', locations[i], items[i]])
+    
+    requirements = data_extractor.GetRequirements()
+    if requirements["triforce"] == 0xFF:
+        yield "%s,misc,level_nine_triforce_requirement,8 (Vanilla)" % file_path
+    else:
+        yield "%s,misc,level_nine_triforce_requirement,%d" % (file_path, requirements["triforce"])
+    yield "%s,misc,white_sword_cave_requirement,%d" % (file_path, requirements["white_sword"])
+    yield "%s,misc,magical_sword_cave_requirement,%d" % (file_path, requirements["magical_sword"])
+    yield "%s,misc,door_repair_charge,%d" % (file_path, requirements["door_repair"])
+
+    for num in range (0, 38):
+        yield "%s,quote,%d,%s" % (file_path, num, data_extractor.GetQuote(num))
+    maybe_recorder_text = data_extractor.GetRecorderText()
+
+    if maybe_recorder_text:
+        yield "%s,quote,recorder,%s" % (file_path, maybe_recorder_text)
+
+def ProcessRom(file_path, rom_data):
+    """Writes a ROM's CSV lines to a temp file and returns its path, or None if it can't be parsed."""
+    data_extractor = DataExtractor(rom=io.BytesIO(rom_data))
+    try:
+        data_extractor.Parse()
+    except IndexError:
+        return None
+
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as out:
+        try:
+            for line in GenerateCSVLines(file_path, data_extractor):
+                out.write(line + '\n')
+        except BaseException:
+            out.close()
+            os.unlink(out.name)
+            raise
+    return out.name
+
+def SubmitRom(io_executor, executor, in_flight, file_path):
+    """Reads then parses a ROM; read failures are reported through the same returned future."""
+    csv_future = Future()
+
+    def Read():
+        # Released in OnParsed, capping how many ROMs are held in memory.
+        in_flight.acquire()
+        return ReadRom(file_path)
+
+    def OnParsed(parse_future):
+        in_flight.release()
+        if parse_future.cancelled():
+            csv_future.cancel()
+        elif parse_future.exception() is not None:
+            csv_future.set_exception(parse_future.exception())
+        else:
+            csv_future.set_result(parse_future.result())
+
+    def OnRead(read_future):
+        if read_future.cancelled():
+            csv_future.cancel()
+            return
+        try:
+            parse_future = executor.submit(ProcessRom, file_path, read_future.result())
+        except Exception as e:
+            in_flight.release()
+            csv_future.set_exception(e)
+            return
+        parse_future.add_done_callback(OnParsed)
+
+    io_executor.submit(Read).add_done_callback(OnRead)
+    return csv_future
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--files', type=str, required=True, help='Roms to process and print')
@@ -43,69 +158,32 @@ def main():
         else:
             files_to_process.append(pattern)
 
-    for file_path in files_to_process:
-        with open(file_path, 'rb') as f:
-            rom = io.BytesIO(f.read())
-            data_extractor = DataExtractor(rom=rom)
-            try:
-               data_extractor.Parse()
-            except IndexError:
-                print("Error parsing level data in %s." % file_path)
-                exit()
-
-            # Print out room data for each level
-            for level in range(1, 10):
-                if level in data_extractor.data:
-                    for room in data_extractor.data[level]:
-                        print(GenerateLevelCSVLine(file_path, level, data_extractor.data[level][room]))
-
-            # Print out overworld screens
-            if data_extractor.data:
-                for screen_num in data_extractor.data[0]:
-                    print(GenerateOverworldCSVLine(file_path, data_extractor.data[0][screen_num]))
-
-            # Caves
-            if data_extractor.shop_data:
-                for cave_type in [0x10, 0x11, 0x12, 0x13, 0x18]:
-                    for i in range (0,3):
-                        if data_extractor.shop_data[cave_type][i] != 0x3F:
-                            print(",".join([file_path, "cave", CAVE_NAME[cave_type],
-                                ITEM_TYPES[data_extractor.shop_data[cave_type][i]]]))
-
-            # Shops
-            if data_extractor.shop_data:
-                for cave_type in [0x1D, 0x1E, 0x1F, 0x20, 0x1A, 0x23, 0x21, 0x22]:
-                    for i in range (0,3):
-                        if data_extractor.shop_data[cave_type][i] != 0x3F:
-                            print(",".join([file_path, "cave", CAVE_NAME[cave_type],
-                                ITEM_TYPES[data_extractor.shop_data[cave_type][i]],
-                                str(data_extractor.shop_data[cave_type][i+3])]))
-
-            # Print out Overworld items as "Level 0"
-            locations = ["Armos", "Coast"]
-            items = data_extractor.GetOverworldItems()
-            for i in range (0, 2):
-                print(','.join([file_path, '0', locations[i], items[i]]))
-            
-            requirements = data_extractor.GetRequirements()
-            if requirements["triforce"] == 0xFF:
-                print ("%s,misc,level_nine_triforce_requirement,8 (Vanilla)" % file_path)
-            else:
-                print ("%s,misc,level_nine_triforce_requirement,%d" %
-                       (file_path, requirements["triforce"]))
-            print("%s,misc,white_sword_cave_requirement,%d" %
-                  (file_path, requirements["white_sword"]))
-            print("%s,misc,magical_sword_cave_requirement,%d" %
-                  (file_path, requirements["magical_sword"]))
-            print("%s,misc,door_repair_charge,%d" %
-                  (file_path, requirements["door_repair"]))
-
-            for num in range (0, 38):
-                print("%s,quote,%d,%s" % (file_path, num, data_extractor.GetQuote(num)))
-            maybe_recorder_text = data_extractor.GetRecorderText()
-
-            if maybe_recorder_text:
-                print("%s,quote,recorder,%s" % (file_path, maybe_recorder_text))
+    # Read on threads and parse in processes; output stays in input order.
+    max_workers = os.cpu_count() or 1
+    in_flight = threading.BoundedSemaphore(2 * max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor, \
+         ThreadPoolExecutor(max_workers=4) as io_executor:
+        csv_futures = [SubmitRom(io_executor, executor, in_flight, file_path)
+                       for file_path in files_to_process]
+        num_copied = 0
+        try:
+            for file_path, csv_future in zip(files_to_process, csv_futures):
+                csv_path = csv_future.result()
+                if csv_path is None:
+                    print("Error parsing level data in %s." % file_path)
+                    exit()
+                with open(csv_path) as f:
+                    shutil.copyfileobj(f, sys.stdout)
+                os.unlink(csv_path)
+                num_copied += 1
+        finally:
+            # Remove output that finished but was never copied.
+            io_executor.shutdown(cancel_futures=True)
+            executor.shutdown(cancel_futures=True)
+            for csv_future in csv_futures[num_copied:]:
+                if (csv_future.done() and not csv_future.cancelled()
+                        and csv_future.exception() is None and csv_future.result()):
+                    os.unlink(csv_future.result())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+NES_HEADER_OFFSET = 0x10
+
+
+def MakeRom(bad_quote=False):
+    """Builds a minimal ROM that parses, optionally with an undecodable quote."""
+    rom = bytearray(NES_HEADER_OFFSET + 0x20000)
+    rom[NES_HEADER_OFFSET + 0x18000:NES_HEADER_OFFSET + 0x18002] = b'\x00\x84'
+    rom[NES_HEADER_OFFSET + 0x18002:NES_HEADER_OFFSET + 0x18004] = b'\x00\x87'
+    rom[NES_HEADER_OFFSET + 0x1800E:NES_HEADER_OFFSET + 0x18010] = b'\x00\x8A'
+    for level_num in range(0, 10):
+        start = NES_HEADER_OFFSET + 0x19300 + level_num * 0xFC
+        rom[start + 0x34:start + 0x3E] = b'\xff' * 9 + b'\x02'
+    # Every quote points at "HI" (0x8100 in the $8000 bank is ROM offset 0x4100).
+    rom[NES_HEADER_OFFSET + 0x4000:NES_HEADER_OFFSET + 0x4000 + 2*38] = b'\x00\x81' * 38
+    rom[NES_HEADER_OFFSET + 0x4100:NES_HEADER_OFFSET + 0x4102] = b'\x11\xd2'
+    if bad_quote:
+        # Point quote 0 at a character code that isn't in CHAR_MAP.
+        rom[NES_HEADER_OFFSET + 0x4000:NES_HEADER_OFFSET + 0x4002] = b'\x80\x81'
+        rom[NES_HEADER_OFFSET + 0x4180] = 0x26
+    return bytes(rom)
+
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        self.rom_dir = tempfile.TemporaryDirectory()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.rom_dir.cleanup)
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def _WriteRom(self, name, data):
+        path = os.path.join(self.rom_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _RunCli(self, files):
+        env = dict(os.environ, TMPDIR=self.tmp_dir.name)
+        return subprocess.run([sys.executable, CLI_PATH, '--files=%s' % ' '.join(files)],
+                              env=env, capture_output=True, text=True)
+
+    def test_successful_run_leaves_no_temp_files(self):
+        good = [self._WriteRom('good%d.nes' % i, MakeRom()) for i in range(3)]
+        result = self._RunCli(good)
+        self.assertEqual(0, result.returncode, result.stderr)
+        self.assertTrue(result.stdout.startswith(good[0] + ','))
+        self.assertIn(good[2] + ',quote,37,HI\n', result.stdout)
+        self.assertEqual([], os.listdir(self.tmp_dir.name))
+
+    def test_worker_error_leaves_no_temp_files(self):
+        good = self._WriteRom('good.nes', MakeRom())
+        bad = self._WriteRom('bad.nes', MakeRom(bad_quote=True))
+        result = self._RunCli([good, bad, good, good])
+        self.assertNotEqual(0, result.returncode)
+        self.assertIn('KeyError', result.stderr)
+        self.assertTrue(result.stdout.startswith(good + ','))
+        self.assertNotIn(bad + ',', result.stdout)
+        self.assertEqual([], os.listdir(self.tmp_dir.name))
+
+    def test_missing_file_leaves_no_temp_files(self):
+        good = self._WriteRom('good.nes', MakeRom())
+        missing = os.path.join(self.rom_dir.name, 'missing.nes')
+        result = self._RunCli([good, missing, good])
+        self.assertNotEqual(0, result.returncode)
+        self.assertIn('FileNotFoundError', result.stderr)
+        # ROMs before the missing one are still printed.
+        self.assertTrue(result.stdout.startswith(good + ','))
+        self.assertEqual([], os.listdir(self.tmp_dir.name))
+
+    def test_unparseable_rom_leaves_no_temp_files(self):
+        good = self._WriteRom('good.nes', MakeRom())
+        empty = self._WriteRom('empty.nes', bytes(NES_HEADER_OFFSET + 0x20000))
+        result = self._RunCli([good, empty, good, good])
+        self.assertEqual(0, result.returncode, result.stderr)
+        self.assertTrue(result.stdout.endswith(
+            'Error parsing level data in %s.\n' % empty))
+        self.assertEqual([], os.listdir(self.tmp_dir.name))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,7 @@
 from rom_reader import RomReader
 import io
 from typing import IO, List
-import math
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from constants import Direction, WallType, ROOM_TYPES, ENEMY_TYPES, ITEM_TYPES
 from constants import ENTRANCE_DIRECTION_MAP, PALETTE_COLORS, CAVE_NAME_SHORT, CAVE_NAME
 from constants import OVERWORLD_BLOCK_TYPES, DOOR_TYPES
@@ -11,14 +10,84 @@ PALETTE_OFFSET = 0xB
 START_ROOM_OFFSET = 0x2F
 STAIRWAY_LIST_OFFSET = 0x34
 DISPLAY_OFFSET_OFFSET = 0x2D
+# Cave and shop items live in table 4 of the overworld block, three per cave.
+# Each cave's three prices sit SHOP_PRICES_DISTANCE bytes after its items.
+SHOP_ITEMS_OFFSET = 4*0x80
+SHOP_PRICES_DISTANCE = 0x14*3
+
+# Index into DataExtractor.level_blocks for each level number (0 is the overworld).
+LEVEL_BLOCK_INDEX = (0, 1, 1, 1, 1, 1, 1, 2, 2, 2)
+
+# Number of enemies in a room, indexed by the top two bits of its enemy byte.
+ENEMY_COUNTS = (3, 5, 6, 8)
+
+# Order in which the four walls of a room are examined.
+DIRECTIONS = (Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST)
+
+# Spiral Stair, Narrow Stair, and Diamond Stair room type codes.
+STAIRWAY_ROOM_TYPES = frozenset([0x1A, 0x1B, 0x1C])
+# Room type codes that have a middle row pushblock.
+PUSHBLOCK_ROOM_TYPES = frozenset(
+    [0x01, 0x06, 0x07, 0x08, 0x09, 0x10, 0x0A, 0x0C, 0x0D, 0x11, 0x1F, 0x22])
+
+# (Byte offset into the level block, bits to shift) of each direction's wall
+# type. North/south walls live in table 0, east/west walls in table 1.
+WALL_TYPE_LOCATION = {
+  Direction.NORTH: (0x00, 5),
+  Direction.SOUTH: (0x00, 2),
+  Direction.WEST: (0x80, 5),
+  Direction.EAST: (0x80, 2)
+}
+
+# Per-direction display tables used by _VisitRoom. Built once here rather than
+# on every wall of every room visited.
+DIRECTION_TEXT = {
+  Direction.NORTH: "north",
+  Direction.SOUTH: "south",
+  Direction.WEST: "west",
+  Direction.EAST: "east"
+}
+WALL_OFFSET_X = {
+  Direction.NORTH: -.5,
+  Direction.SOUTH: -.5,
+  Direction.WEST: -1,
+  Direction.EAST: 0
+}
+WALL_OFFSET_Y = {
+  Direction.NORTH: 0,
+  Direction.SOUTH: -1,
+  Direction.WEST: -.5,
+  Direction.EAST: -.5
+}
+DOOR_OFFSET_X = {
+  Direction.NORTH: -.5,
+  Direction.SOUTH: -.5,
+  Direction.WEST: -.95,
+  Direction.EAST: -.05
+}
+DOOR_OFFSET_Y = {
+  Direction.NORTH: -.05,
+  Direction.SOUTH: -.95,
+  Direction.WEST: -.5,
+  Direction.EAST: -.5
+}
+DOOR_COLORS: Dict[int, str] = {
+  WallType.BOMB_HOLE: 'blue',
+  WallType.LOCKED_DOOR_1: 'orange',
+  WallType.LOCKED_DOOR_2: 'orange',
+  WallType.WALK_THROUGH_WALL_1: 'purple',
+  WallType.WALK_THROUGH_WALL_2: 'purple',
+  WallType.SHUTTER_DOOR: 'brown',
+  WallType.DOOR: 'black'
+}
 
 class DataExtractor(object):
     def __init__(self, rom: io.BytesIO, allow_decoding_roms: bool=False) -> None:
         self.rom_reader = RomReader(rom)
         self.is_z1r = True
-        self.level_info: List[List[int]] = []
+        self.level_info: List[bytes] = []
         self.data: Dict[int, Dict[int, Any]] = {}
-        self.shop_data = {}
+        self.shop_data: Dict[int, List[int]] = {}
    
         for level_num in range(0, 10):
             level_info = self.rom_reader.GetLevelInfo(level_num)
@@ -28,7 +97,7 @@ class DataExtractor(object):
                 continue
             self.is_z1r = False
 
-        self.level_blocks: List[List[int]] = []
+        self.level_blocks: List[bytes] = []
         for level_num in [0,1,7]:
             self.level_blocks.append(self.rom_reader.GetLevelBlock(level_num))
         
@@ -38,14 +107,7 @@ class DataExtractor(object):
             self.ProcessLevel(level_num)
 
     def GetRoomData(self, level_num: int, byte_num: int) -> int:
-        foo = -1
-        if level_num == 0:
-            level_block_num = 0
-        elif level_num in range(1, 7):
-            level_block_num = 1
-        elif level_num in range(7, 10):
-            level_block_num = 2
-        return self.level_blocks[level_block_num][byte_num]
+        return self.level_blocks[LEVEL_BLOCK_INDEX[level_num]][byte_num]
       
     def GetLevelEntranceDirection(self, level_num: int) -> Direction:
         if not self.is_z1r:
@@ -83,7 +145,8 @@ class DataExtractor(object):
         return stairway_list
 
     def ProcessOverworld(self) -> None:  
-        self.data[0] = {}
+        overworld_data = self.data[0] = {}
+        overworld_block = self.level_blocks[0]
         for screen_num in range(0, 0x80):
             # Skip any screens that aren't "Secret in 1st Quest"
             if (self.GetRoomData(0, screen_num + 5*0x80) & 0x80) > 0:
@@ -93,14 +156,14 @@ class DataExtractor(object):
             if destination == 0:
               continue
             x = screen_num % 0x10 
-            y = 8 - (math.floor(screen_num / 0x10))
+            y = 8 - (screen_num >> 4)
             
             block_type = 'Tell Tetra what block type this is'
             try:
                 block_type = OVERWORLD_BLOCK_TYPES[screen_num]
             except KeyError:
                 continue
-            self.data[0][screen_num] = {
+            screen = overworld_data[screen_num] = {
                 'screen_num': '%x' % screen_num,
                 'col': x,
                 'x_coord': x + .5,
@@ -110,42 +173,41 @@ class DataExtractor(object):
                 'block_type': block_type,
               }
             if destination in CAVE_NAME:
-              self.data[0][screen_num]['cave_name'] = CAVE_NAME[destination]
+              screen['cave_name'] = CAVE_NAME[destination]
             if destination in CAVE_NAME_SHORT:
-              self.data[0][screen_num]['cave_name_short'] = CAVE_NAME_SHORT[destination]
+              screen['cave_name_short'] = CAVE_NAME_SHORT[destination]
 
         for shop_type in range (0x10, 0x24):
-            base_index = 4*0x80 + 3*(shop_type-0x10)
-            price_index = 4*0x80 + 3*(shop_type-0x10) + 0x14*3
-            self.shop_data[shop_type] = []
-            self.shop_data[shop_type].append(self.level_blocks[0][base_index] & 0x3F)
-            self.shop_data[shop_type].append(self.level_blocks[0][base_index + 1] & 0x3F)
-            self.shop_data[shop_type].append(self.level_blocks[0][base_index + 2] & 0x3F)
-            self.shop_data[shop_type].append(self.level_blocks[0][price_index])
-            self.shop_data[shop_type].append(self.level_blocks[0][price_index + 1])
-            self.shop_data[shop_type].append(self.level_blocks[0][price_index + 2])
+            base_index = SHOP_ITEMS_OFFSET + 3*(shop_type-0x10)
+            price_index = base_index + SHOP_PRICES_DISTANCE
+            shop = self.shop_data[shop_type] = []
+            shop.append(overworld_block[base_index] & 0x3F)
+            shop.append(overworld_block[base_index + 1] & 0x3F)
+            shop.append(overworld_block[base_index + 2] & 0x3F)
+            shop.append(overworld_block[price_index])
+            shop.append(overworld_block[price_index + 1])
+            shop.append(overworld_block[price_index + 2])
  
     def ProcessLevel(self, level_num: int) -> None:
-        self.data[level_num] = {}
+        level_data = self.data[level_num] = {}
         rooms_to_visit = [(self.GetLevelStartRoomNumber(level_num), 
                            self.GetLevelEntranceDirection(level_num))]
-        while True:
+        while rooms_to_visit:
             room_num, direction = rooms_to_visit.pop()
             new_rooms = self._VisitRoom(level_num, room_num, direction)
             if new_rooms:
                 rooms_to_visit.extend(new_rooms)
-            if not rooms_to_visit:
-                break
         stairway_num = 1
         for stairway_room_num in self.GetLevelStairwayRoomNumberList(level_num):
             left_exit = self.GetRoomData(level_num, stairway_room_num) % 0x80
-            right_exit = self.GetRoomData(level_num, stairway_room_num + 0x80) % 0x80
+            right_exit_data = self.GetRoomData(level_num, stairway_room_num + 0x80)
+            right_exit = right_exit_data % 0x80
 
-            if not (self._HasStairway(level_num, self.GetRoomData(level_num,(stairway_room_num + 0x80)))):
+            if not (self._HasStairway(level_num, right_exit_data)):
                 continue
 
             # Ignore any rooms in the stairway room list that don't connect to the current level.
-            if not (left_exit in self.data[level_num] and right_exit in self.data[level_num]):
+            if not (left_exit in level_data and right_exit in level_data):
                 # For debugging stairway issues
                 # print("WARNING: This seed has a phantom stairway room %x in level %d" %
                 #       (stairway_room_num, level_num))
@@ -158,13 +220,13 @@ class DataExtractor(object):
 
             if left_exit == right_exit:  # Item stairway
               item_type = int(self.GetRoomData(level_num, stairway_room_num + (4 * 0x80)) % 0x1F)
-              self.data[level_num][left_exit]['stair_info'] = '%s' % ITEM_TYPES[item_type]
-              self.data[level_num][left_exit]['stair_tooltip'] = '%s' % ITEM_TYPES[item_type]
+              level_data[left_exit]['stair_info'] = '%s' % ITEM_TYPES[item_type]
+              level_data[left_exit]['stair_tooltip'] = '%s' % ITEM_TYPES[item_type]
             else:  # Transport stairway
-              self.data[level_num][left_exit]['stair_info'] = 'Stair #%d' % stairway_num
-              self.data[level_num][right_exit]['stair_info'] = 'Stair #%d' % stairway_num
-              self.data[level_num][left_exit]['stair_tooltip'] = 'Stairway #%d' % stairway_num
-              self.data[level_num][right_exit]['stair_tooltip'] = 'Stairway #%d' % stairway_num
+              level_data[left_exit]['stair_info'] = 'Stair #%d' % stairway_num
+              level_data[right_exit]['stair_info'] = 'Stair #%d' % stairway_num
+              level_data[left_exit]['stair_tooltip'] = 'Stairway #%d' % stairway_num
+              level_data[right_exit]['stair_tooltip'] = 'Stairway #%d' % stairway_num
               stairway_num += 1
             
     def GetLevelDisplayOffset(self, level_num: int) -> int:
@@ -174,18 +236,19 @@ class DataExtractor(object):
     def _VisitRoom(self,
                    level_num: int,
                    room_num: int,
-                   from_dir: Direction) -> None:
-        if room_num in self.data[level_num]:
-          return
+                   from_dir: Direction) -> Optional[List[Tuple[int, Direction]]]:
+        level_data = self.data[level_num]
+        if room_num in level_data:
+          return None
         if room_num not in range(0, 0x80):
-          return
-        tbr = []
+          return None
+        tbr: List[Tuple[int, Direction]] = []
         x = (room_num + self.GetLevelDisplayOffset(level_num)) % 0x10 
-        y = 8 - (math.floor(room_num / 0x10))
+        y = 8 - (room_num >> 4)
         
         enemy_num = self._GetEnemyNum(level_num, room_num)
         enemy_type = self._GetEnemyType(level_num, room_num)
-        self.data[level_num][room_num] = {
+        room = level_data[room_num] = {
           'col': x,
           'x_coord': x - .5,
           'row': y,
@@ -200,70 +263,27 @@ class DataExtractor(object):
           'item_info': self._GetItemText(level_num, room_num),
         }
         
-        for direction in [Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST]:
+        wall_types = {}
+        for direction in DIRECTIONS:
           wall_type = self._GetWallType(level_num, room_num, direction)
+          wall_types[direction] = wall_type
+          direction_text = DIRECTION_TEXT[direction]
           if wall_type == WallType.SOLID_WALL:
-            direction_text = {
-              Direction.NORTH: "north",
-              Direction.SOUTH: "south",
-              Direction.WEST: "west",
-              Direction.EAST: "east"
-            }
-            direction_x = {
-              Direction.NORTH: -.5,
-              Direction.SOUTH: -.5,
-              Direction.WEST: -1,
-              Direction.EAST: 0
-            }
-            direction_y = {
-              Direction.NORTH: 0,
-              Direction.SOUTH: -1,
-              Direction.WEST: -.5,
-              Direction.EAST: -.5
-            }
-            if (room_num + int(direction)) in self.data[level_num]:
-              self.data[level_num][room_num]['%s.color' % direction_text[direction]] = "red"
-
-            self.data[level_num][room_num]['%s.wall.x' % direction_text[direction]] = x + direction_x[direction]
-            self.data[level_num][room_num]['%s.wall.y' % direction_text[direction]] = y + direction_y[direction]
-            self.data[level_num][room_num]['%s.wall_type' % direction_text[direction]] = DOOR_TYPES[wall_type]  
+            if (room_num + int(direction)) in level_data:
+              room['%s.color' % direction_text] = "red"
+
+            room['%s.wall.x' % direction_text] = x + WALL_OFFSET_X[direction]
+            room['%s.wall.y' % direction_text] = y + WALL_OFFSET_Y[direction]
           if wall_type != WallType.SOLID_WALL:
-            direction_text = {
-              Direction.NORTH: "north",
-              Direction.SOUTH: "south",
-              Direction.WEST: "west",
-              Direction.EAST: "east"
-            }
-            direction_x = {
-              Direction.NORTH: -.5,
-              Direction.SOUTH: -.5,
-              Direction.WEST: -.95,
-              Direction.EAST: -.05
-            }
-            direction_y = {
-              Direction.NORTH: -.05,
-              Direction.SOUTH: -.95,
-              Direction.WEST: -.5,
-              Direction.EAST: -.5
-            }
-            color = {
-              WallType.BOMB_HOLE: 'blue',
-              WallType.LOCKED_DOOR_1: 'orange',
-              WallType.LOCKED_DOOR_2: 'orange',
-              WallType.WALK_THROUGH_WALL_1: 'purple',
-              WallType.WALK_THROUGH_WALL_2: 'purple',
-              WallType.SHUTTER_DOOR: 'brown',
-              WallType.DOOR: 'black'
-            }
-            self.data[level_num][room_num]['%s.x' % direction_text[direction]] = x + direction_x[direction]
-            self.data[level_num][room_num]['%s.y' % direction_text[direction]] = y + direction_y[direction]
-            self.data[level_num][room_num]['%s.color' % direction_text[direction]] = color[wall_type]  
-          self.data[level_num][room_num]['%s.wall_type' % direction_text[direction]] = DOOR_TYPES[wall_type]  
+            room['%s.x' % direction_text] = x + DOOR_OFFSET_X[direction]
+            room['%s.y' % direction_text] = y + DOOR_OFFSET_Y[direction]
+            room['%s.color' % direction_text] = DOOR_COLORS[wall_type]
+          room['%s.wall_type' % direction_text] = DOOR_TYPES[wall_type]  
         
-        for direction in [Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST]:
+        for direction in DIRECTIONS:
             if from_dir and direction == from_dir:
                 continue
-            if self._GetWallType(level_num, room_num, direction) == WallType.SOLID_WALL:
+            if wall_types[direction] == WallType.SOLID_WALL:
                 continue
             tbr.append((room_num + direction, direction.inverse()))
 
@@ -289,56 +309,41 @@ class DataExtractor(object):
         
 
     def _GetWallType(self, level_num: int, room_num: int, direction: Direction) -> int:
-        offset = 0x80 if direction in [Direction.EAST, Direction.WEST] else 0x00
-        bits_to_shift = 32 if direction in [Direction.NORTH, Direction.WEST] else 4
-
-        wall_type = math.floor(
-            self.GetRoomData(level_num, room_num + offset) / bits_to_shift) % 0x08
+        offset, bits_to_shift = WALL_TYPE_LOCATION[direction]
+        wall_type = (self.GetRoomData(level_num, room_num + offset) >> bits_to_shift) & 0x07
         return wall_type
 
-    def _HasStairway(self, level_num: int, room_num: int) -> str:
-        room_type_code = self.GetRoomData(level_num, room_num + 3*0x80) & 0x3F
+    def _HasStairway(self, level_num: int, room_num: int) -> bool:
+        room_type_data = self.GetRoomData(level_num, room_num + 3*0x80)
+        room_type_code = room_type_data & 0x3F
 
         # Spiral Stair, Narrow Stair, and Diamond Stair rooms always have a stairway
-        if room_type_code in [0x1A, 0x1B, 0x1C]:
+        if room_type_code in STAIRWAY_ROOM_TYPES:
             return True
 
         # Check if there are any shutter doors in this room. If so, they'll open when a middle
         # row pushblock is pushed instead of a stairway appearing
-        for direction in [Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST]:
+        for direction in DIRECTIONS:
             if self._GetWallType(level_num, room_num, direction) == WallType.SHUTTER_DOOR:
                 return False
 
         # Check if "Movable block" bit is set in a room_type that has a middle row pushblock
-        if room_type_code in [0x01, 0x06, 0x07, 0x08, 0x09, 0x10, 0x0A, 0x0C, 0x0D, 0x11, 0x1F, 0x22]:
-            if ((self.GetRoomData(level_num, room_num + 3*0x80) >> 6) & 0x01) > 0:
+        if room_type_code in PUSHBLOCK_ROOM_TYPES:
+            if ((room_type_data >> 6) & 0x01) > 0:
                 return True
         return False
 
     def _GetRoomType(self, level_num: int, room_num: int) -> str:
-        code = self.GetRoomData(level_num, room_num + 3*0x80)
-        while code >= 0x40:
-            code -= 0x40             
+        code = self.GetRoomData(level_num, room_num + 3*0x80) & 0x3F
         if code in ROOM_TYPES:
             return ROOM_TYPES[code]
         return 'ERROR CODE %X' % code
 
     def _GetEnemyNum(self, level_num: int, room_num: int) -> int:
-        code = math.floor(self.GetRoomData(level_num, room_num + 2*0x80) / 64)
-        if code == 0:
-          return 3
-        elif code == 1:
-          return 5
-        elif code == 2:
-          return 6
-        elif code == 3:
-          return 8
-        return -1
+        return ENEMY_COUNTS[self.GetRoomData(level_num, room_num + 2*0x80) >> 6]
 
     def _GetEnemyText(self, level_num: int, room_num: int) -> str:
-      code = self.GetRoomData(level_num, room_num + 2*0x80)
-      while code >= 0x40:
-          code -= 0x40
+      code = self.GetRoomData(level_num, room_num + 2*0x80) & 0x3F
       if self.GetRoomData(level_num, room_num + 3*0x80) >= 0x80:
           code += 0x40
 
@@ -349,24 +354,20 @@ class DataExtractor(object):
           return num_text + ENEMY_TYPES[code]
       return 'ERROR CODE %X' % code
 
-    def _GetEnemyType(self, level_num: int, room_num: int) -> int:
-        code = self.GetRoomData(level_num, room_num + 2*0x80)
-        while code >= 0x40:
-            code -= 0x40
+    def _GetEnemyType(self, level_num: int, room_num: int) -> str:
+        code = self.GetRoomData(level_num, room_num + 2*0x80) & 0x3F
         if self.GetRoomData(level_num, room_num + 3*0x80) >= 0x80:
             code += 0x40
         if code in ENEMY_TYPES:
             return ENEMY_TYPES[code]
         return 'E %X' % code
 
-    def _GetItemText(self, level_num: int, room_num: int) -> int:
-       code =  self.GetRoomData(level_num, room_num + 4*0x80)
-       while code >= 0x20:
-           code -= 0x20
+    def _GetItemText(self, level_num: int, room_num: int) -> str:
+       code = self.GetRoomData(level_num, room_num + 4*0x80) & 0x1F
        if (code == self.rom_reader.GetNothingCode() and
            self._GetEnemyType(level_num, room_num) != ENEMY_TYPES[0x3E]):
          return ''
-       is_drop = math.floor(self.GetRoomData(level_num, room_num + 5*0x80) / 4) % 0x02 == 1
+       is_drop = (self.GetRoomData(level_num, room_num + 5*0x80) >> 2) & 0x01 == 1
        item_name = ITEM_TYPES[code]
        return "%s%s" % ('D ' if is_drop else '', item_name)
 
@@ -383,7 +384,7 @@ class DataExtractor(object):
              tbr.append(ITEM_TYPES[item])
          return tbr
          
-    def GetRequirements(self) -> int:
+    def GetRequirements(self) -> Dict[str, int]:
       return self.rom_reader.GetRequirements()
 
     def GetQuote(self, quote_num:int) -> str:
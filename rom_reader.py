@@ -1,6 +1,7 @@
 from enum import IntEnum
 import io
-from typing import IO, List
+import struct
+from typing import IO, Dict, List
 from constants import CHAR_MAP
 
 OVERWORLD_DATA_LOCATION = 0x18400
@@ -22,25 +23,34 @@ WHITE_SWORD_REQUIREMENT_ADDRESS = 0x48FD
 MAGICAL_SWORD_REQUIREMENT_ADDRESS = 0x4906
 DOOR_REPAIR_CHARGE_ADDRESS = 0x4890
 
+# Decoded text for each quote byte. The low 6 bits select the character and
+# high bits of 1 or 2 mean a space follows it.
+QUOTE_BYTE_TEXT = {
+    val: CHAR_MAP[val & 0x3F] + (" " if (val >> 6) in (1, 2) else "")
+    for val in range(0x100) if (val & 0x3F) in CHAR_MAP
+}
+
 
 class RomReader:
   
     def __init__(self, rom: io.BytesIO) -> None:
-        self.rom = rom
+        # Read the whole ROM once up front so lookups are plain slices of an
+        # in-memory buffer instead of a seek() + read() per access.
+        rom.seek(0)
+        self.rom_data = rom.read()
 
-    def _ReadMemory(self, address: int, num_bytes: int = 1) -> List[int]:
+    def _ReadMemory(self, address: int, num_bytes: int = 1) -> bytes:
         assert num_bytes > 0, "num_bytes shouldn't be negative"
-        self.rom.seek(NES_HEADER_OFFSET + address)
-        data = []  # type: List[int]
-        for raw_byte in self.rom.read(num_bytes):
-            data.append(int(raw_byte))
-        return data
+        start = NES_HEADER_OFFSET + address
+        # A negative slice start would silently wrap to the end of the ROM.
+        if start < 0:
+            raise ValueError("negative seek value %d" % start)
+        return self.rom_data[start:start + num_bytes]
 
-    def _GetLevelBlockPointer(self, addr: int) -> List[int]:
-       val = self._ReadMemory(addr, 0x02)
-       return val[1]*0x100 + val[0]
+    def _GetLevelBlockPointer(self, addr: int) -> int:
+       return struct.unpack_from('<H', self.rom_data, NES_HEADER_OFFSET + addr)[0]
 
-    def GetLevelBlock(self, level_num: int) -> List[int]:
+    def GetLevelBlock(self, level_num: int) -> bytes:
         if level_num == 0:
             if self._GetLevelBlockPointer(OVERWORLD_POINTER_LOCATION) == 0x8400:
                 return self._ReadMemory(OVERWORLD_DATA_LOCATION, 0x300)
@@ -54,45 +64,42 @@ class RomReader:
               return self._ReadMemory(LEVEL_7_TO_9_FIRST_QUEST_DATA_LOCATION, 0x300)
             elif self._GetLevelBlockPointer(LEVEL_7_TO_9_POINTER_LOCATION) == 0x9000:
               return self._ReadMemory(LEVEL_7_TO_9_SECOND_QUEST_DATA_LOCATION, 0x300)
-        return []
+        return b''
 
-    def GetLevelInfo(self, level_num: int) -> List[int]:
+    def GetLevelInfo(self, level_num: int) -> bytes:
         start = VARIOUS_DATA_LOCATION + level_num * 0xFC
         return self._ReadMemory(start, 0xFC)
         
     def GetOverworldItemData(self) -> List[int]:
         return [
-            self._ReadMemory(ARMOS_ITEM_ADDRESS, 0x01)[0],
-            self._ReadMemory(COAST_ITEM_ADDRESS, 0x01)[0],
+            self.rom_data[NES_HEADER_OFFSET + ARMOS_ITEM_ADDRESS],
+            self.rom_data[NES_HEADER_OFFSET + COAST_ITEM_ADDRESS],
         ]
 
-    def GetRequirements(self) -> int:
+    def GetRequirements(self) -> Dict[str, int]:
         return {
-            "triforce": self._ReadMemory(TRIFORCE_REQUIREMENT_ADDRESS, 0x01)[0],
-            "white_sword": int(self._ReadMemory(WHITE_SWORD_REQUIREMENT_ADDRESS, 0x01)[0] / 0x10) + 1,
-            "magical_sword": int(self._ReadMemory(MAGICAL_SWORD_REQUIREMENT_ADDRESS, 0x01)[0] / 0x10) + 1,
-            "door_repair": self._ReadMemory(DOOR_REPAIR_CHARGE_ADDRESS, 0x01)[0],
+            "triforce": self.rom_data[NES_HEADER_OFFSET + TRIFORCE_REQUIREMENT_ADDRESS],
+            "white_sword": (self.rom_data[NES_HEADER_OFFSET + WHITE_SWORD_REQUIREMENT_ADDRESS] >> 4) + 1,
+            "magical_sword": (self.rom_data[NES_HEADER_OFFSET + MAGICAL_SWORD_REQUIREMENT_ADDRESS] >> 4) + 1,
+            "door_repair": self.rom_data[NES_HEADER_OFFSET + DOOR_REPAIR_CHARGE_ADDRESS],
         }
           
         
     def GetQuote(self, num: int) -> str:
       assert num in range(0, 38)
-      low_byte = self._ReadMemory(0x4000 + 2*num, 0x01)[0]
-      high_byte =  self._ReadMemory(0x4000 + 2*num + 1, 0x01)[0] - 0x40
-      addr = high_byte * 0x100 + low_byte
+      # Quote pointers are little-endian CPU addresses in the $8000 bank,
+      # which starts 0x4000 bytes into the PRG data.
+      addr = struct.unpack_from('<H', self.rom_data, NES_HEADER_OFFSET + 0x4000 + 2*num)[0] - 0x4000
       raw_quote = self._ReadMemory(addr, 0x40)
-      out_quote = ""
+      out_quote = []
       for val in raw_quote:
-          char = val & 0x3F
-          out_quote += CHAR_MAP[char]
-          high_bits = (val >> 6) & 0x03
-          if high_bits in [1, 2]:
-              out_quote += " "
-          if high_bits == 3:
+          out_quote.append(QUOTE_BYTE_TEXT[val])
+          # High bits of 3 mark the last character of the quote.
+          if val >= 0xC0:
               break
-      return out_quote
+      return ''.join(out_quote)
 
-    def hex_to_text(self, hex):
+    def hex_to_text(self, hex: bytes) -> str:
       tbr = ""
       for val in hex:
         tbr += CHAR_MAP[val]
@@ -109,5 +116,5 @@ class RomReader:
        from_text = raw_quote[4+recorder_len + name_len : 4+recorder_len + name_len + from_len]
        return ' '.join([self.hex_to_text(name_text), self.hex_to_text(from_text)])
     
-    def GetNothingCode(self):
-      return self._ReadMemory(0x1784F, 0x01)[0]   
+    def GetNothingCode(self) -> int:
+      return self.rom_data[NES_HEADER_OFFSET + 0x1784F]   